@@ -1,5 +1,53 @@
-from src import extract_data
+from src import logger, config, extract_data, compact_data, plan_data
+from src.tools import basic_tools, profile_tools
+
+import os
+import sys
+import signal
+import argparse
+
+
+PROFILE_FOLDER = os.path.join(extract_data.DATA_FOLDER, "profile")
 
 
 if __name__ == "__main__":
-    extract_data.create_json_file()
+    parser = argparse.ArgumentParser(description="League Of Legends : Loser Queue ?")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="merge the data files into a deduplicated and indexed store by tier",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="estimate the requests and the wall time of the extraction without sending any request",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every function and stage and write a report in the 'data/profile' folder",
+    )
+    args = parser.parse_args()
+
+    # 'docker stop' sends SIGTERM: exit normally so that the caches are saved
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
+    profiling = args.profile or config.get_settings().PROFILING
+    if profiling:
+        profile_tools.enable_profiling()
+
+    try:
+        with profile_tools.stage("total"):
+            if args.compact:
+                compact_data.compact_data_files()
+            elif args.plan:
+                plan_data.create_plan()
+            else:
+                extract_data.create_json_file()
+    finally:
+        if profiling:
+            profile_tools.dump_profile(
+                folder=PROFILE_FOLDER,
+                timestamp=basic_tools.get_timestamp_utc(),
+                logger=logger,
+            )
@@ -0,0 +1,305 @@
+from src import logger
+from src.tools.error_tools import exception
+from src.extract_data import DATA_FOLDER
+
+import os
+import re
+import json
+import pathlib
+import sqlite3
+from typing import Iterator, List, Union
+
+
+STORE_FOLDER = os.path.join(DATA_FOLDER, "store")
+
+DATA_FILE_NAME_PATTERN = re.compile(r"^data_([A-Z]+)_(\d+)_(\d+)\.json$")
+
+# Index of the store of each tier (opened on first use)
+_indexes = {}
+
+
+@exception(logger)
+def get_store_file_path(tier: str) -> str:
+    """Returns the path of the store of a tier (one match informations by line)
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+
+    Returns:
+        str: path of the store
+    """
+    return os.path.join(STORE_FOLDER, f"{tier}.jsonl")
+
+
+@exception(logger)
+def get_index_file_path(tier: str) -> str:
+    """Returns the path of the index of the store of a tier
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+
+    Returns:
+        str: path of the index
+    """
+    return os.path.join(STORE_FOLDER, f"{tier}.index.sqlite")
+
+
+@exception(logger)
+def get_index(tier: str) -> sqlite3.Connection:
+    """Returns the index of the store of a tier (opened on first use, created if there is no store)
+
+    The index is a SQLite database composed of:
+    - 'meta': size in bytes of the store covered by the index
+    - 'files': names of the data files already merged into the store
+    - 'matches': offset and length of the line of each Match ID in the store
+    - 'participants': Match IDs of each participant's PUUID
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+
+    Returns:
+        sqlite3.Connection: connection to the index
+    """
+    if tier not in _indexes:
+        pathlib.Path(STORE_FOLDER).mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(get_index_file_path(tier=tier))
+        with connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('size', 0);
+                CREATE TABLE IF NOT EXISTS files (name TEXT PRIMARY KEY);
+                CREATE TABLE IF NOT EXISTS matches (
+                    match_id TEXT PRIMARY KEY,
+                    offset INTEGER NOT NULL,
+                    length INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS participants (
+                    puuid TEXT NOT NULL,
+                    match_id TEXT NOT NULL,
+                    PRIMARY KEY (puuid, match_id)
+                ) WITHOUT ROWID;
+                """)
+        _indexes[tier] = connection
+    return _indexes[tier]
+
+
+@exception(logger)
+def get_indexed_size(tier: str) -> int:
+    """Returns the size in bytes of the store of a tier covered by its index
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+
+    Returns:
+        int: size in bytes of the store
+    """
+    (size,) = (
+        get_index(tier=tier)
+        .execute("SELECT value FROM meta WHERE key = 'size'")
+        .fetchone()
+    )
+    return size
+
+
+@exception(logger)
+def get_data_files_by_tier() -> dict:
+    """Returns the names of the data files of the 'data' folder by tier (oldest first)
+
+    Returns:
+        dict: names of the data files by tier
+    """
+    data_files_by_tier = {}
+    if not os.path.isdir(DATA_FOLDER):
+        return data_files_by_tier
+
+    for file_name in os.listdir(DATA_FOLDER):
+        match = DATA_FILE_NAME_PATTERN.match(file_name)
+        if match:
+            tier, timestamp = match.group(1), int(match.group(3))
+            data_files_by_tier.setdefault(tier, []).append((timestamp, file_name))
+
+    return {
+        tier: [file_name for _, file_name in sorted(data_files)]
+        for tier, data_files in data_files_by_tier.items()
+    }
+
+
+@exception(logger)
+def compact_tier(tier: str, file_names: List[str]) -> int:
+    """Merges the new data files of a tier into its store and updates its index
+
+    Matches already in the store are skipped. Data files already compacted are ignored.
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+        file_names (List[str]): names of the data files of the tier
+
+    Returns:
+        int: number of matches added to the store
+    """
+    index = get_index(tier=tier)
+    compacted_file_names = {
+        file_name for (file_name,) in index.execute("SELECT name FROM files")
+    }
+    new_file_names = [
+        file_name for file_name in file_names if file_name not in compacted_file_names
+    ]
+    if not new_file_names:
+        logger.info(f"Store of the 'tier': '{tier}' is up to date")
+        return 0
+
+    size = get_indexed_size(tier=tier)
+    store_file_path = get_store_file_path(tier=tier)
+    store_size = (
+        os.path.getsize(store_file_path) if os.path.exists(store_file_path) else 0
+    )
+    if store_size < size:
+        raise ValueError(
+            f"Store of the 'tier': '{tier}' is missing or truncated ({store_size} bytes, "
+            f"{size} bytes indexed), remove its index to rebuild it"
+        )
+
+    number_of_matches_added = 0
+    # The index is only committed once the store is written to the disk
+    with index, open(store_file_path, "ab") as store:
+        # Drop lines appended after the last committed index (interrupted compaction)
+        if store_size > size:
+            store.truncate(size)
+        offset = size
+
+        for file_name in new_file_names:
+            with open(os.path.join(DATA_FOLDER, file_name), "r", encoding="utf-8") as f:
+                infos_from_matches = json.load(f)
+
+            for infos in infos_from_matches:
+                match_id = infos["match_id"]
+                if index.execute(
+                    "SELECT 1 FROM matches WHERE match_id = ?", (match_id,)
+                ).fetchone():
+                    continue
+
+                line = (json.dumps(infos, ensure_ascii=False) + "\n").encode("utf-8")
+                store.write(line)
+                index.execute(
+                    "INSERT INTO matches (match_id, offset, length) VALUES (?, ?, ?)",
+                    (match_id, offset, len(line)),
+                )
+                offset += len(line)
+                number_of_matches_added += 1
+
+                index.executemany(
+                    "INSERT OR IGNORE INTO participants (puuid, match_id) VALUES (?, ?)",
+                    [
+                        (participant_infos["participant_puuid"], match_id)
+                        for team_id in ["team_100", "team_200"]
+                        for participant_infos in infos[team_id]
+                    ],
+                )
+
+            index.execute("INSERT INTO files (name) VALUES (?)", (file_name,))
+
+        store.flush()
+        os.fsync(store.fileno())
+        index.execute("UPDATE meta SET value = ? WHERE key = 'size'", (offset,))
+
+    (number_of_matches,) = index.execute("SELECT COUNT(*) FROM matches").fetchone()
+    logger.info(
+        f"Store of the 'tier': '{tier}' compacted ({len(new_file_names)} new files, "
+        f"{number_of_matches_added} new matches, {number_of_matches} matches in total)"
+    )
+    return number_of_matches_added
+
+
+@exception(logger)
+def compact_data_files():
+    """Merges the new data files of the 'data' folder into the store of their tier"""
+    pathlib.Path(STORE_FOLDER).mkdir(parents=True, exist_ok=True)
+
+    for tier, file_names in get_data_files_by_tier().items():
+        compact_tier(tier=tier, file_names=file_names)
+
+
+@exception(logger)
+def read_match_infos(tier: str, offset: int, length: int) -> dict:
+    """Returns the informations of a match from its line in the store of a tier
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+        offset (int): offset of the line in the store
+        length (int): length of the line
+
+    Returns:
+        dict: informations of the match
+    """
+    with open(get_store_file_path(tier=tier), "rb") as store:
+        store.seek(offset)
+        return json.loads(store.read(length))
+
+
+@exception(logger)
+def get_match_infos(tier: str, match_id: str) -> Union[None, dict]:
+    """Returns the informations of a match from the store of a tier
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+        match_id (str): Match ID
+
+    Returns:
+        Union[None, dict]: None or the informations of the match
+    """
+    row = (
+        get_index(tier=tier)
+        .execute("SELECT offset, length FROM matches WHERE match_id = ?", (match_id,))
+        .fetchone()
+    )
+    if row is None:
+        return None
+
+    offset, length = row
+    return read_match_infos(tier=tier, offset=offset, length=length)
+
+
+@exception(logger)
+def get_match_infos_of_participant(tier: str, participant_puuid: str) -> List[dict]:
+    """Returns the informations of the matches of a participant from the store of a tier
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+        participant_puuid (str): participant's PUUID
+
+    Returns:
+        List[dict]: list of informations of the matches
+    """
+    rows = (
+        get_index(tier=tier)
+        .execute(
+            "SELECT matches.offset, matches.length FROM participants "
+            "JOIN matches ON matches.match_id = participants.match_id "
+            "WHERE participants.puuid = ? ORDER BY matches.offset",
+            (participant_puuid,),
+        )
+        .fetchall()
+    )
+    return [
+        read_match_infos(tier=tier, offset=offset, length=length)
+        for offset, length in rows
+    ]
+
+
+@exception(logger)
+def iter_match_infos(tier: str) -> Iterator[dict]:
+    """Iterates over the informations of all the matches of the store of a tier
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+
+    Yields:
+        Iterator[dict]: informations of a match
+    """
+    size = get_indexed_size(tier=tier)
+    if size == 0:
+        return
+
+    with open(get_store_file_path(tier=tier), "rb") as store:
+        while store.tell() < size:
+            yield json.loads(store.readline())
@@ -30,6 +30,42 @@ class Settings:
     TIERS: list = ast.literal_eval(config["tiers"])
     NUMBER_OF_MATCHES_BY_TIER: int = int(config["number_of_matches_by_tier"])
 
+    # Rate limits of the API key, enforced only with 'PREFETCH': [[<NUMBER OF REQUESTS>, <SECONDS>], ...]
+    RATE_LIMITS: list = ast.literal_eval(
+        config.get("rate_limits", "[[20, 1], [100, 120]]")
+    )
+
+    # Number of seed matches found in advance of the extraction
+    PIPELINE_QUEUE_SIZE: int = int(config.get("pipeline_queue_size", "5"))
+
+    # Lifetime (seconds) of the cached Match IDs of a summoner
+    MATCH_IDS_CACHE_TTL: int = int(config.get("match_ids_cache_ttl", "600"))
+
+    # Lifetime (seconds) of the cached HTTP errors by status code (other errors are not cached)
+    NEGATIVE_CACHE_TTLS: dict = ast.literal_eval(
+        config.get("negative_cache_ttls", "{400: 86400, 404: 604800}")
+    )
+
+    # Background prefetching of the matches of the next participants (optional)
+    PREFETCH: bool = ast.literal_eval(config.get("prefetch", "False"))
+    # Share of each rate limit never used by the prefetching
+    PREFETCH_RESERVE: float = float(config.get("prefetch_reserve", "0.2"))
+
+    # Per-function and per-stage timing (optional, same as 'python main.py --profile')
+    PROFILING: bool = ast.literal_eval(config.get("profiling", "False"))
+
+    # Sequential early stopping (optional)
+    EARLY_STOPPING: bool = ast.literal_eval(config.get("early_stopping", "False"))
+    EARLY_STOPPING_CI_WIDTH: float = float(
+        config.get("early_stopping_ci_width", "0.05")
+    )
+    EARLY_STOPPING_CONFIDENCE: float = float(
+        config.get("early_stopping_confidence", "0.95")
+    )
+    EARLY_STOPPING_MIN_MATCHES: int = int(
+        config.get("early_stopping_min_matches", "30")
+    )
+
 
 def get_settings():
     """Returns the bot settings
@@ -1,11 +1,19 @@
 from src import logger
 from src import config
 from src.tools.error_tools import exception
-from src.tools import api_tools, basic_tools
+from src.tools import (
+    api_tools,
+    basic_tools,
+    cache_tools,
+    prefetch_tools,
+    profile_tools,
+    stats_tools,
+)
 
 import os
 import json
 import pathlib
+from typing import Callable, List, Set, Tuple, Union
 
 
 DATA_FOLDER = os.path.join(
@@ -14,10 +22,63 @@ DATA_FOLDER = os.path.join(
 
 
 @exception(logger)
-def create_json_file():
-    settings = config.get_settings()
+def get_stop_condition(
+    tier: str, settings: config.Settings
+) -> Union[None, Callable[[dict], bool]]:
+    """Returns the early stopping condition of a tier (None if early stopping is disabled)
+
+    The condition updates the streak effect of the tier with the informations of each
+    extracted match and returns True once the width of its confidence interval is
+    lower than 'EARLY_STOPPING_CI_WIDTH'.
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+        settings (config.Settings): the settings
+
+    Returns:
+        Union[None, Callable[[dict], bool]]: the early stopping condition
+    """
+    if not settings.EARLY_STOPPING:
+        return None
+
+    streak_counts = stats_tools.get_empty_streak_counts()
+    number_of_matches = 0
+
+    def stop_condition(infos: dict) -> bool:
+        nonlocal number_of_matches
+        number_of_matches += 1
+        stats_tools.update_streak_counts(streak_counts=streak_counts, infos=infos)
+        streak_effect = stats_tools.get_streak_effect(
+            streak_counts=streak_counts,
+            confidence=settings.EARLY_STOPPING_CONFIDENCE,
+        )
+        if number_of_matches < settings.EARLY_STOPPING_MIN_MATCHES:
+            return False
+        if streak_effect["ci_width"] is None:
+            return False
+        if streak_effect["ci_width"] > settings.EARLY_STOPPING_CI_WIDTH:
+            return False
+
+        logger.info(
+            f"Streak effect of the 'tier': '{tier}' converged after {number_of_matches} matches "
+            f"(effect: {streak_effect['effect']:.4f}, CI width: {streak_effect['ci_width']:.4f})"
+        )
+        return True
 
-    for tier in settings.TIERS:
+    return stop_condition
+
+
+@exception(logger)
+def check_tiers(tiers: List[str]):
+    """Checks that every tier exists
+
+    Args:
+        tiers (List[str]): list of tiers
+
+    Raises:
+        ValueError: a tier does not exist
+    """
+    for tier in tiers:
         if tier not in [
             "CHALLENGER",
             "GRANDMASTER",
@@ -31,23 +92,155 @@ def create_json_file():
         ]:
             raise ValueError(f"'tier': '{tier}' does not exist")
 
+
+@exception(logger)
+def extract_tier(
+    tier: str,
+    number_of_matches: int,
+    stop_condition: Union[None, Callable[[dict], bool]] = None,
+    excluded_match_ids: Union[None, Set[str]] = None,
+) -> Tuple[List[str], bool]:
+    """Extracts the informations of a sample of matches of a tier in a data file
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+        number_of_matches (int): number of matches to extract
+        stop_condition (Union[None, Callable[[dict], bool]], optional): early stopping
+            condition of the tier (see 'get_stop_condition'). Defaults to None.
+        excluded_match_ids (Union[None, Set[str]], optional): Match IDs of the seed
+            matches already extracted. Defaults to None.
+
+    Returns:
+        Tuple[List[str], bool]: Match IDs of the extracted matches and True if the
+        extraction stopped early
+    """
+    settings = config.get_settings()
+
+    # Seed matches are found in a background thread, at most
+    # 'PIPELINE_QUEUE_SIZE' matches ahead of the extraction
+    matches_with_tier = basic_tools.iter_in_background(
+        iterable=profile_tools.iter_timed(
+            iterable=api_tools.iter_a_sample_of_matches(
+                tier=tier,
+                number_of_matches=number_of_matches,
+                excluded_match_ids=excluded_match_ids,
+            ),
+            name=f"find seed matches of '{tier}'",
+        ),
+        maxsize=settings.PIPELINE_QUEUE_SIZE,
+    )
+
+    # The matches not extracted by a stopped tier are shared with the other tiers
+    stopped = False
+
+    def tier_stop_condition(infos: dict) -> bool:
+        nonlocal stopped
+        stopped = stop_condition(infos)
+        return stopped
+
+    infos_from_matches = api_tools.iter_infos_from_matches(
+        matches_with_tier=matches_with_tier,
+        number_of_matches=number_of_matches,
+        stop_condition=tier_stop_condition if stop_condition else None,
+    )
+
+    # Informations are written as soon as they are extracted
+    tmp_file_path = os.path.join(
+        DATA_FOLDER, f"data_{tier}_{basic_tools.get_timestamp_utc()}.json.tmp"
+    )
+    match_ids = []
+    with profile_tools.stage(f"extract infos of '{tier}'"):
+        try:
+            with open(tmp_file_path, "w", encoding="utf-8") as f:
+                f.write("[")
+                for infos in infos_from_matches:
+                    with profile_tools.stage(f"write data of '{tier}'"):
+                        if match_ids:
+                            f.write(", ")
+                        json.dump(infos, f, ensure_ascii=False)
+                        f.flush()
+                    match_ids.append(infos["match_id"])
+                f.write("]")
+        finally:
+            matches_with_tier.close()
+
+    if not stopped:
+        logger.info(
+            f"Matches unique ({len(match_ids)}) of 'tier': '{tier}' extracted (missing {number_of_matches - len(match_ids)})"
+        )
+    # An empty data file is only kept for the first extraction of a tier
+    if not match_ids and excluded_match_ids:
+        os.remove(tmp_file_path)
+        return match_ids, stopped
+
+    file_path = os.path.join(
+        DATA_FOLDER,
+        f"data_{tier}_{len(match_ids)}_{basic_tools.get_timestamp_utc()}.json",
+    )
+    os.replace(tmp_file_path, file_path)
+    logger.info(
+        f"Data of the 'tier': '{tier}' ({len(match_ids)} matches) are located in file with path: '{file_path}'"
+    )
+    return match_ids, stopped
+
+
+@exception(logger)
+def create_json_file():
+    settings = config.get_settings()
+
+    check_tiers(tiers=settings.TIERS)
+
     # Create "data" folder
     pathlib.Path(DATA_FOLDER).mkdir(parents=True, exist_ok=True)
 
-    for tier in settings.TIERS:
-        matches_with_tier = api_tools.get_a_sample_of_matches(
-            tier=tier, number_of_matches=settings.NUMBER_OF_MATCHES_BY_TIER
-        )
-        infos = api_tools.extract_infos_from_matches(
-            matches_with_tier=matches_with_tier
-        )
+    prefetch_tools.start_prefetcher(
+        prefetch_function=api_tools.prefetch_previous_matches
+    )
 
-        file_path = os.path.join(
-            DATA_FOLDER,
-            f"data_{tier}_{len(infos)}_{basic_tools.get_timestamp_utc()}.json",
-        )
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(infos, f, ensure_ascii=False)
-            logger.info(
-                f"Data of the 'tier': '{tier}' ({len(infos)} matches) are located in file with path: '{file_path}'"
+    # The caches are saved even if the extraction is interrupted
+    try:
+        stop_conditions = {}
+        match_ids_by_tier = {}
+        # Tiers whose streak effect did not converge
+        unconverged_tiers = []
+        # Matches not extracted (converged tiers and seed matches missing)
+        spare_matches = 0
+        for tier in settings.TIERS:
+            stop_conditions[tier] = get_stop_condition(tier=tier, settings=settings)
+            match_ids, stopped = extract_tier(
+                tier=tier,
+                number_of_matches=settings.NUMBER_OF_MATCHES_BY_TIER,
+                stop_condition=stop_conditions[tier],
             )
+            match_ids_by_tier[tier] = set(match_ids)
+            spare_matches += settings.NUMBER_OF_MATCHES_BY_TIER - len(match_ids)
+            if stop_conditions[tier] and not stopped:
+                unconverged_tiers.append(tier)
+
+        # Spare matches are shared between the tiers which did not converge. The matches
+        # not extracted in a pass are shared again, a tier being dropped once it converges
+        # or when it does not find any new seed match.
+        while spare_matches and unconverged_tiers:
+            floor, remainder = divmod(spare_matches, len(unconverged_tiers))
+            spare_matches = 0
+            for i, tier in enumerate(list(unconverged_tiers)):
+                number_of_matches = floor + 1 if i < remainder else floor
+                if number_of_matches == 0:
+                    continue
+
+                logger.info(
+                    f"{number_of_matches} spare matches are given to the 'tier': '{tier}'"
+                )
+                match_ids, stopped = extract_tier(
+                    tier=tier,
+                    number_of_matches=number_of_matches,
+                    stop_condition=stop_conditions[tier],
+                    excluded_match_ids=match_ids_by_tier[tier],
+                )
+                match_ids_by_tier[tier].update(match_ids)
+                spare_matches += number_of_matches - len(match_ids)
+                if stopped or not match_ids:
+                    unconverged_tiers.remove(tier)
+    finally:
+        prefetch_tools.stop_prefetcher()
+        cache_tools.save_stats()
@@ -0,0 +1,177 @@
+from src import logger
+from src import config
+from src.tools.error_tools import exception
+from src.tools import api_tools, basic_tools, cache_tools
+from src.extract_data import check_tiers
+
+from typing import Dict, List, Union
+
+
+# Routing value (rate limited separately) of each endpoint
+ENDPOINTS = {
+    "league-exp-v4 entries": "euw1",
+    "summoner-v4 by-name": "euw1",
+    "match-v5 match IDs": "europe",
+    "match-v5 match": "europe",
+}
+
+# Cache used by each endpoint
+CACHES = {
+    "match-v5 match IDs": "match_ids",
+    "match-v5 match": "matches",
+}
+
+NUMBER_OF_PARTICIPANTS = 10
+
+# Average duration of a single HTTP request (seconds)
+AVERAGE_REQUEST_LATENCY = 0.2
+
+
+@exception(logger)
+def plan_tier(
+    tier: str, number_of_matches: int, hit_rates: Union[None, Dict[str, float]] = None
+) -> Dict[str, dict]:
+    """Returns the expected requests and cache hits by endpoint to extract the matches of a tier
+
+    The number of ladder pages and the number of summoners sampled come from the last
+    ladder snapshot of the tier (see 'api_tools.save_ladder_snapshot').
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+        number_of_matches (int): number of matches to extract
+        hit_rates (Union[None, Dict[str, float]], optional): expected cache hit rate by endpoint. Defaults to None.
+
+    Returns:
+        Dict[str, dict]: 'requests' and 'cache_hits' by endpoint
+    """
+    hit_rates = hit_rates or {}
+
+    snapshot = api_tools.load_ladder_snapshot(tier=tier)
+    if snapshot:
+        ladder_requests = sum(snapshot["pages"].values())
+        number_of_summoners = min(number_of_matches, snapshot["number_of_entries"])
+    else:
+        # One page of entries and the empty page ending each division
+        number_of_divisions = (
+            1 if tier in ["CHALLENGER", "GRANDMASTER", "MASTER"] else 4
+        )
+        ladder_requests = 2 * number_of_divisions
+        number_of_summoners = number_of_matches
+        logger.warning(
+            f"No ladder snapshot for the 'tier': '{tier}', ladder requests are underestimated"
+        )
+
+    number_of_histories = number_of_matches * NUMBER_OF_PARTICIPANTS
+    requests_by_endpoint = {
+        "league-exp-v4 entries": ladder_requests,
+        "summoner-v4 by-name": number_of_summoners,
+        "match-v5 match IDs": number_of_summoners + number_of_histories,
+        "match-v5 match": number_of_matches
+        + number_of_histories * api_tools.NUMBER_OF_PREVIOUS_MATCHES,
+    }
+
+    return {
+        endpoint: {
+            "requests": requests,
+            "cache_hits": round(requests * hit_rates.get(endpoint, 0.0)),
+        }
+        for endpoint, requests in requests_by_endpoint.items()
+    }
+
+
+@exception(logger)
+def get_wall_time(
+    requests_by_endpoint: Dict[str, int], rate_limits: List[list]
+) -> float:
+    """Returns the expected wall time (seconds) to send requests with the rate limits of a key
+
+    Args:
+        requests_by_endpoint (Dict[str, int]): number of HTTP requests by endpoint
+        rate_limits (List[list]): rate limits of the key ([number of requests, seconds])
+
+    Returns:
+        float: the expected wall time in seconds
+    """
+    requests_by_region = {}
+    for endpoint, requests in requests_by_endpoint.items():
+        region = ENDPOINTS[endpoint]
+        requests_by_region[region] = requests_by_region.get(region, 0) + requests
+
+    rate_limited_time = max(
+        requests / number_of_requests * seconds
+        for requests in requests_by_region.values()
+        for number_of_requests, seconds in rate_limits
+    )
+    latency_time = sum(requests_by_endpoint.values()) * AVERAGE_REQUEST_LATENCY
+    return max(rate_limited_time, latency_time)
+
+
+@exception(logger)
+def create_plan() -> Dict[str, dict]:
+    """Logs the expected requests, cache hits and wall time of an extraction (no HTTP request is sent)
+
+    Returns:
+        Dict[str, dict]: plan of each tier ('requests' and 'cache_hits' by endpoint)
+    """
+    settings = config.get_settings()
+
+    check_tiers(tiers=settings.TIERS)
+
+    # Hit rates of the previous runs (hits on prefetched entries excluded)
+    cache_hit_rates = cache_tools.get_hit_rates()
+    hit_rates = {
+        endpoint: cache_hit_rates.get(cache_name, 0.0)
+        for endpoint, cache_name in CACHES.items()
+    }
+
+    plans = {}
+    total_requests_by_endpoint = {endpoint: 0 for endpoint in ENDPOINTS}
+    for tier in settings.TIERS:
+        plans[tier] = plan_tier(
+            tier=tier,
+            number_of_matches=settings.NUMBER_OF_MATCHES_BY_TIER,
+            hit_rates=hit_rates,
+        )
+        for endpoint, plan in plans[tier].items():
+            logger.info(
+                f"[Plan] 'tier': '{tier}', '{endpoint}': {plan['requests']} requests "
+                f"({plan['cache_hits']} cache hits)"
+            )
+            total_requests_by_endpoint[endpoint] += (
+                plan["requests"] - plan["cache_hits"]
+            )
+
+        requests_by_endpoint = {
+            endpoint: plan["requests"] - plan["cache_hits"]
+            for endpoint, plan in plans[tier].items()
+        }
+        wall_time = get_wall_time(
+            requests_by_endpoint=requests_by_endpoint,
+            rate_limits=settings.RATE_LIMITS,
+        )
+        logger.info(
+            f"[Plan] 'tier': '{tier}', {sum(requests_by_endpoint.values())} HTTP requests, "
+            f"estimated wall time: {basic_tools.format_duration(wall_time)}"
+        )
+
+    # Known gaps of the plan
+    logger.info(
+        "[Plan] Not modelled: duplicated seed matches (less matches extracted) and early "
+        "stopping ('EARLY_STOPPING', less requests), the figures are an upper bound"
+    )
+
+    wall_time = get_wall_time(
+        requests_by_endpoint=total_requests_by_endpoint,
+        rate_limits=settings.RATE_LIMITS,
+    )
+    number_of_matches = settings.NUMBER_OF_MATCHES_BY_TIER * len(settings.TIERS)
+    if wall_time == 0:
+        return plans
+
+    logger.info(
+        f"[Plan] Total: {sum(total_requests_by_endpoint.values())} HTTP requests for "
+        f"{number_of_matches} matches with rate limits {settings.RATE_LIMITS}, "
+        f"estimated wall time: {basic_tools.format_duration(wall_time)} "
+        f"({number_of_matches / wall_time * 86400:.0f} matches by day)"
+    )
+    return plans
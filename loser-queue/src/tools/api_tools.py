@@ -5,10 +5,13 @@ from src.tools.error_tools import (
     NotWaitableHttpError,
     WaitableHttpError,
 )
+from src.tools import basic_tools, cache_tools, prefetch_tools, rate_tools
 
 import os
+import json
 import random
-from typing import List, Dict, Union
+import pathlib
+from typing import Callable, Iterable, Iterator, List, Dict, Set, Tuple, Union
 
 import dotenv
 import requests
@@ -19,6 +22,14 @@ ENV_FILE_FOLDER = os.path.dirname(
 )
 dotenv.load_dotenv(os.path.join(ENV_FILE_FOLDER, ".env"))
 
+LADDER_FOLDER = os.path.join(ENV_FILE_FOLDER, "data", "ladder")
+
+# Number of previous matches extracted for each participant of a match
+NUMBER_OF_PREVIOUS_MATCHES = 20
+
+# Active entries of each tier (the ladder is crawled once by run)
+_ladders = {}
+
 
 @exception(logger)
 def get_api_key() -> str:
@@ -30,6 +41,24 @@ def get_api_key() -> str:
     return os.environ.get("API_KEY")
 
 
+def raise_cached_error(endpoint: str, identifier: str):
+    """Raises the cached HTTP error of a request, if any (see 'cache_tools.get_cached_error')
+
+    Args:
+        endpoint (str): name of the endpoint
+        identifier (str): identifier requested (summoner's name, Match ID, ...)
+
+    Raises:
+        NotWaitableHttpError: the request already failed with a cached HTTP code
+    """
+    status_code = cache_tools.get_cached_error(endpoint=endpoint, identifier=identifier)
+    if status_code is not None:
+        logger.warning(
+            f"[Cache] NotWaitableHttpError ({status_code}). '{endpoint}' with identifier: '{identifier}' can not be extracted"
+        )
+        raise NotWaitableHttpError(f"HTTP {status_code}")
+
+
 @exception(logger)
 @retry(
     requests.exceptions.ConnectionError, tries=9000, delay=10, backoff=1, logger=logger
@@ -48,8 +77,11 @@ def get_summoner_from_summoner_name(summoner_name: str) -> dict:
     Returns:
         dict: Summoner's infos in a dict
     """
+    raise_cached_error(endpoint="summoner-v4 by-name", identifier=summoner_name.lower())
+
     api_key = get_api_key()
     params = {"api_key": api_key}
+    rate_tools.acquire(region="euw1")
     r_get = requests.get(
         f"https://euw1.api.riotgames.com/lol/summoner/v4/summoners/by-name/{summoner_name.lower()}",
         params=params,
@@ -67,6 +99,11 @@ def get_summoner_from_summoner_name(summoner_name: str) -> dict:
     logger.warning(
         f"[HTTP GET Riot] NotWaitableHttpError ({r_get.status_code}). Summoner with name: '{summoner_name}' can not be extracted."
     )
+    cache_tools.cache_error(
+        endpoint="summoner-v4 by-name",
+        identifier=summoner_name.lower(),
+        status_code=r_get.status_code,
+    )
     raise NotWaitableHttpError(f"HTTP {r_get.status_code}")
 
 
@@ -94,6 +131,7 @@ def get_active_entry_from_rank(page: int, tier: str, division: str) -> List[dict
 
     queue = "RANKED_SOLO_5x5"
     params = {"api_key": api_key, "page": page}
+    rate_tools.acquire(region="euw1")
     r_get = requests.get(
         f"https://euw1.api.riotgames.com/lol/league-exp/v4/entries/{queue}/{tier}/{division}",
         params=params,
@@ -138,6 +176,13 @@ def get_match_ids_from_summoner_puuid(
     Returns:
         List[str]: a list of summoner's Match ID
     """
+    match_ids = cache_tools.get_cached_match_ids(
+        summoner_puuid=summoner_puuid, limit=limit
+    )
+    if match_ids is not None:
+        return match_ids
+    raise_cached_error(endpoint="match-v5 match IDs", identifier=summoner_puuid)
+
     api_key = get_api_key()
     params = {
         "api_key": api_key,
@@ -145,12 +190,16 @@ def get_match_ids_from_summoner_puuid(
         "queue": 420,
         "type": "ranked",
     }  # queue=420 -> ranked 5V5
+    rate_tools.acquire(region="europe")
     r_get = requests.get(
         f"https://europe.api.riotgames.com/lol/match/v5/matches/by-puuid/{summoner_puuid}/ids",
         params=params,
     )
     if r_get.ok:
         match_ids = r_get.json()
+        cache_tools.cache_match_ids(
+            summoner_puuid=summoner_puuid, limit=limit, match_ids=match_ids
+        )
         logger.info(
             f"[HTTP GET Riot] Match IDs ({len(match_ids)}) of Summoner with puuid: {summoner_puuid} extracted"
         )
@@ -165,6 +214,11 @@ def get_match_ids_from_summoner_puuid(
     logger.warning(
         f"[HTTP GET Riot] NotWaitableHttpError ({r_get.status_code}). Match IDs of Summoner with puuid: {summoner_puuid} can not be extracted"
     )
+    cache_tools.cache_error(
+        endpoint="match-v5 match IDs",
+        identifier=summoner_puuid,
+        status_code=r_get.status_code,
+    )
     raise NotWaitableHttpError(f"HTTP {r_get.status_code}")
 
 
@@ -184,17 +238,25 @@ def get_match_from_match_id(match_id: str) -> dict:
         NotWaitableHttpError: HTTP code >= 400 and HTTP code < 429
 
     Returns:
-        dict: the dict of a Match
+        dict: the dict of a Match (only the fields used by the project, see 'cache_tools.trim_match')
     """
+    match = cache_tools.get_cached_match(match_id=match_id)
+    if match is not None:
+        return match
+    raise_cached_error(endpoint="match-v5 match", identifier=match_id)
+
     api_key = get_api_key()
     params = {"api_key": api_key}
+    rate_tools.acquire(region="europe")
     r_get = requests.get(
         f"https://europe.api.riotgames.com/lol/match/v5/matches/{match_id}",
         params=params,
     )
     if r_get.ok:
         logger.info(f"[HTTP GET Riot] Match with ID: {match_id} extracted")
-        return r_get.json()
+        match = cache_tools.trim_match(match=r_get.json())
+        cache_tools.cache_match(match=match)
+        return match
 
     if r_get.status_code >= 429:
         logger.warning(
@@ -205,6 +267,9 @@ def get_match_from_match_id(match_id: str) -> dict:
     logger.warning(
         f"[HTTP GET Riot] NotWaitableHttpError ({r_get.status_code}). Match with ID: {match_id} can not be extracted"
     )
+    cache_tools.cache_error(
+        endpoint="match-v5 match", identifier=match_id, status_code=r_get.status_code
+    )
     raise NotWaitableHttpError(f"HTTP {r_get.status_code}")
 
 
@@ -308,9 +373,46 @@ def extract_participants_puuid_from_match(match: dict) -> List[str]:
     return metadata["participants"]
 
 
+@exception(logger)
+def save_ladder_snapshot(tier: str, pages: Dict[str, int], number_of_entries: int):
+    """Saves the size of the ladder of a tier in the 'data/ladder' folder
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+        pages (Dict[str, int]): number of pages requested by division
+        number_of_entries (int): number of active entries of the tier
+    """
+    pathlib.Path(LADDER_FOLDER).mkdir(parents=True, exist_ok=True)
+    snapshot = {
+        "timestamp": basic_tools.get_timestamp_utc(),
+        "pages": pages,
+        "number_of_entries": number_of_entries,
+    }
+    with open(os.path.join(LADDER_FOLDER, f"{tier}.json"), "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+
+
+@exception(logger)
+def load_ladder_snapshot(tier: str) -> Union[None, dict]:
+    """Returns the size of the last saved ladder of a tier
+
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+
+    Returns:
+        Union[None, dict]: None or the ladder size ('timestamp', 'pages' and 'number_of_entries')
+    """
+    file_path = os.path.join(LADDER_FOLDER, f"{tier}.json")
+    if not os.path.exists(file_path):
+        return None
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
 @exception(logger)
 def get_summoner_names_from_tier(tier: str, number: int) -> List[str]:
-    """Returns a list of summoner names from a tier
+    """Returns a list of summoner names from a tier (the ladder of the tier is crawled on first use)
 
     Args:
         tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
@@ -319,31 +421,30 @@ def get_summoner_names_from_tier(tier: str, number: int) -> List[str]:
     Returns:
         List[str]: list of summoner names
     """
-    divisions = ["I", "II", "III", "IV"]
-    entries = []
-    summoner_names = []
-    if tier in ["CHALLENGER", "GRANDMASTER", "MASTER"]:
-        for i in range(1, 100):
-            entries_packaged = get_active_entry_from_rank(
-                page=i, tier=tier, division="I"
-            )
-
-            if entries_packaged:
-                entries.extend(entries_packaged)
-            else:
-                break
-    else:
+    if tier not in _ladders:
+        if tier in ["CHALLENGER", "GRANDMASTER", "MASTER"]:
+            divisions = ["I"]
+        else:
+            divisions = ["I", "II", "III", "IV"]
+        entries = []
+        pages = {}
         for division in divisions:
             for i in range(1, 100):
                 entries_packaged = get_active_entry_from_rank(
                     page=i, tier=tier, division=division
                 )
+                pages[division] = i
 
                 if entries_packaged:
                     entries.extend(entries_packaged)
                 else:
                     break
 
+        save_ladder_snapshot(tier=tier, pages=pages, number_of_entries=len(entries))
+        _ladders[tier] = entries
+    entries = _ladders[tier]
+    summoner_names = []
+
     # Random sample of entries
     entries_selected = random.sample(entries, k=min(number, len(entries)))
 
@@ -354,6 +455,35 @@ def get_summoner_names_from_tier(tier: str, number: int) -> List[str]:
     return summoner_names
 
 
+@exception(logger)
+def get_last_match_ids_of_summoner_by_puuid(
+    summoner_puuid: str, number_of_matches: int, max_match_id: Union[None, str] = None
+) -> List[str]:
+    """Returns a list of the latest Match IDs of a summoner from the summoner's PUUID
+
+    Args:
+        summoner_puuid (str): summoner's PUUID
+        number_of_matches (int): number of Match IDs to extract
+        max_match_id (Union[None, str], optional): extracted Match IDs older than this match ID. Defaults to None.
+
+    Returns:
+        List[str]: list of the latest Match IDs
+    """
+    if not max_match_id:
+        return get_match_ids_from_summoner_puuid(
+            summoner_puuid=summoner_puuid, limit=number_of_matches
+        )
+
+    max_id = int(max_match_id.split("_")[1])
+    all_match_ids = get_match_ids_from_summoner_puuid(
+        summoner_puuid=summoner_puuid, limit=100
+    )
+    for i, match_id in enumerate(all_match_ids):
+        if int(match_id.split("_")[1]) < max_id:
+            return all_match_ids[i : (i + number_of_matches)]
+    return []
+
+
 @exception(logger)
 def get_last_matches_of_summoner_by_puuid(
     summoner_puuid: str, number_of_matches: int, max_match_id: Union[None, str] = None
@@ -368,24 +498,11 @@ def get_last_matches_of_summoner_by_puuid(
     Returns:
         List[dict]: list of the latest matches
     """
-    if max_match_id:
-        max_id = int(max_match_id.split("_")[1])
-        all_match_ids = get_match_ids_from_summoner_puuid(
-            summoner_puuid=summoner_puuid, limit=100
-        )
-        limit_reached = False
-        for i, match_id in enumerate(all_match_ids):
-            if int(match_id.split("_")[1]) < max_id:
-                match_ids = all_match_ids[i : (i + number_of_matches)]
-                limit_reached = True
-                break
-
-        if not limit_reached:
-            match_ids = []
-    else:
-        match_ids = get_match_ids_from_summoner_puuid(
-            summoner_puuid=summoner_puuid, limit=number_of_matches
-        )
+    match_ids = get_last_match_ids_of_summoner_by_puuid(
+        summoner_puuid=summoner_puuid,
+        number_of_matches=number_of_matches,
+        max_match_id=max_match_id,
+    )
 
     matches = []
     try:
@@ -398,107 +515,165 @@ def get_last_matches_of_summoner_by_puuid(
 
 
 @exception(logger)
-def get_last_matches_of_summoner_by_summoner_name(
-    summoner_name: str, number_of_matches: int, max_match_id: Union[None, str] = None
-) -> List[dict]:
-    """Returns a list of the latest matches of a summoner from the summoner's name
+def prefetch_previous_matches(
+    summoner_puuid: str, max_match_id: str, is_cancelled: Callable[[], bool]
+):
+    """Fills the caches with the previous matches of a participant of a seed match
+    (the same requests as 'extract_infos_from_match')
 
-    Args:
-        summoner_puuid (str): summoner's name
-        number_of_matches (int): number of matches to extract
-        max_match_id (Union[None, str], optional): extracted match ID older than this match ID. Defaults to None.
+    The Match IDs of the participant are kept in cache until the seed match is extracted.
 
-    Returns:
-        List[dict]: list of the latest matches
+    Args:
+        summoner_puuid (str): participant's PUUID
+        max_match_id (str): Match ID of the seed match
+        is_cancelled (Callable[[], bool]): checked before each request, the prefetching
+            stops when it returns True (seed match reached by the extraction)
     """
+    if is_cancelled():
+        return
+
     try:
-        summoner = get_summoner_from_summoner_name(summoner_name=summoner_name)
-        summoner_puuid = extract_puuid_from_summoner(summoner=summoner)
+        match_ids = get_last_match_ids_of_summoner_by_puuid(
+            summoner_puuid=summoner_puuid,
+            number_of_matches=NUMBER_OF_PREVIOUS_MATCHES,
+            max_match_id=max_match_id,
+        )
+        if is_cancelled():
+            return
+        cache_tools.pin_match_ids(
+            summoner_puuid=summoner_puuid, seed_match_id=max_match_id
+        )
+        for match_id in match_ids:
+            if is_cancelled():
+                return
+            get_match_from_match_id(match_id=match_id)
     except NotWaitableHttpError as e:
-        return []
-
-    return get_last_matches_of_summoner_by_puuid(
-        summoner_puuid=summoner_puuid,
-        number_of_matches=number_of_matches,
-        max_match_id=max_match_id,
-    )
+        return
 
 
 @exception(logger)
-def get_matches_of_a_tier(tier: str, number_of_matches: int) -> List[Dict[str, dict]]:
-    """Returns a list of matches of a tier (with tier)
+def iter_summoner_puuids_from_tier(
+    tier: str, number_of_matches: int
+) -> Iterator[Tuple[str, int]]:
+    """Iterates over a sample of summoners of a tier with the number of matches to get from each one
 
     Args:
         tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
         number_of_matches (int): number of matches to get
 
-    Returns:
-        List[Dict[str, dict]]: list of matches of a tier (with tier)
+    Yields:
+        Iterator[Tuple[str, int]]: summoner's PUUID and number of matches to get
     """
     summoner_names = get_summoner_names_from_tier(tier=tier, number=number_of_matches)
 
     # If len(summoner_names) < number_of_matches, extract more than 1 game by summoner
-    matches = []
     size_summoner_names = len(summoner_names)
-    if size_summoner_names < number_of_matches:
-        remainder = number_of_matches % size_summoner_names
-        floor = number_of_matches // size_summoner_names
-        for i in range(remainder):
-            matches_packaged = get_last_matches_of_summoner_by_summoner_name(
-                summoner_name=summoner_names[i], number_of_matches=floor + 1
-            )
-            matches.extend(matches_packaged)
-        for i in range(remainder, size_summoner_names):
-            match = get_last_matches_of_summoner_by_summoner_name(
-                summoner_name=summoner_names[i], number_of_matches=1
-            )
-            matches.extend(match)
+    if size_summoner_names == 0:
+        return
+    remainder = number_of_matches % size_summoner_names
+    floor = number_of_matches // size_summoner_names
+    for i, summoner_name in enumerate(summoner_names):
+        try:
+            summoner = get_summoner_from_summoner_name(summoner_name=summoner_name)
+        except NotWaitableHttpError as e:
+            continue
+
+        yield extract_puuid_from_summoner(summoner=summoner), (
+            floor + 1 if i < remainder else floor
+        )
+
+
+@exception(logger)
+def iter_seed_match_ids(
+    summoner_puuids: Iterable[Tuple[str, int]],
+    excluded_match_ids: Union[None, Set[str]] = None,
+) -> Iterator[str]:
+    """Iterates over the last Match IDs of summoners
+
+    Excluded Match IDs are replaced by older Match IDs of the same summoner.
 
-    else:
-        for summoner_name in summoner_names:
-            match = get_last_matches_of_summoner_by_summoner_name(
-                summoner_name=summoner_name, number_of_matches=1
+    Args:
+        summoner_puuids (Iterable[Tuple[str, int]]): summoner's PUUID and number of matches to get
+        excluded_match_ids (Union[None, Set[str]], optional): Match IDs to skip. Defaults to None.
+
+    Yields:
+        Iterator[str]: Match ID
+    """
+    for summoner_puuid, number_of_matches in summoner_puuids:
+        try:
+            match_ids = get_match_ids_from_summoner_puuid(
+                summoner_puuid=summoner_puuid,
+                limit=100 if excluded_match_ids else number_of_matches,
             )
-            matches.extend(match)
+        except NotWaitableHttpError as e:
+            continue
+
+        if excluded_match_ids:
+            match_ids = [
+                match_id for match_id in match_ids if match_id not in excluded_match_ids
+            ][:number_of_matches]
+        yield from match_ids
+
+
+@exception(logger)
+def iter_seed_matches(
+    tier: str,
+    match_ids: Iterable[str],
+    excluded_match_ids: Union[None, Set[str]] = None,
+) -> Iterator[Dict[str, dict]]:
+    """Iterates over the unique matches of a tier (with tier) from their Match IDs
 
-    matches_with_tier = []
-    for match in matches:
-        matches_with_tier.append({"tier": tier, "match": match})
+    Args:
+        tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
+        match_ids (Iterable[str]): Match IDs
+        excluded_match_ids (Union[None, Set[str]], optional): Match IDs to skip. Defaults to None.
 
-    logger.info(f"Matches ({len(matches_with_tier)}) of 'tier': '{tier}' extracted")
-    return matches_with_tier
+    Yields:
+        Iterator[Dict[str, dict]]: match with tier
+    """
+    seen_match_ids = set(excluded_match_ids or ())
+    for match_id in match_ids:
+        if match_id in seen_match_ids:
+            continue
+        seen_match_ids.add(match_id)
+
+        try:
+            match = get_match_from_match_id(match_id=match_id)
+        except NotWaitableHttpError as e:
+            continue
+
+        prefetch_tools.prefetch_participants_of_match(match=match)
+        yield {"tier": tier, "match": match}
 
 
 @exception(logger)
-def get_a_sample_of_matches(
-    tier: str, number_of_matches: int = 300
-) -> List[Dict[str, dict]]:
-    """Returns a list of unique matches of a tier (with tier)
+def iter_a_sample_of_matches(
+    tier: str,
+    number_of_matches: int = 300,
+    excluded_match_ids: Union[None, Set[str]] = None,
+) -> Iterator[Dict[str, dict]]:
+    """Iterates over unique matches of a tier (with tier), chaining the stages
+    ladder entries -> summoner's PUUIDs -> seed Match IDs -> seed matches one item at a time
 
     Args:
         tier (str): a tier (DIAMOND, PLATINUM, MASTER, ...)
         number_of_matches (int, optional): number of matches to get. Defaults to 300.
+        excluded_match_ids (Union[None, Set[str]], optional): Match IDs to skip. Defaults to None.
 
     Returns:
-        List[Dict[str, dict]]: list of unique matches of a tier (with tier)
+        Iterator[Dict[str, dict]]: match with tier
     """
-
-    matches_with_tier = get_matches_of_a_tier(
+    summoner_puuids = iter_summoner_puuids_from_tier(
         tier=tier, number_of_matches=number_of_matches
     )
-
-    match_ids = []
-    matches_with_tier_unique = []
-    for match_with_tier in matches_with_tier:
-        match_id = extract_match_id_from_match(match_with_tier["match"])
-        if match_id not in match_ids:
-            matches_with_tier_unique.append(match_with_tier)
-            match_ids.append(match_id)
-
-    logger.info(
-        f"Matches unique ({len(matches_with_tier_unique)}) of 'tier': '{tier}' extracted (missing {number_of_matches - len(matches_with_tier_unique)})"
+    match_ids = iter_seed_match_ids(
+        summoner_puuids=summoner_puuids, excluded_match_ids=excluded_match_ids
+    )
+    return iter_seed_matches(
+        tier=tier,
+        match_ids=match_ids,
+        excluded_match_ids=excluded_match_ids,
     )
-    return matches_with_tier_unique
 
 
 @exception(logger)
@@ -515,6 +690,7 @@ def extract_infos_from_match(match_with_tier: dict) -> dict:
     participants_puuid = extract_participants_puuid_from_match(
         match=match_with_tier["match"]
     )
+    prefetch_tools.mark_seed_started(match_id=match_id)
 
     infos = {
         "match_id": match_id,
@@ -533,7 +709,7 @@ def extract_infos_from_match(match_with_tier: dict) -> dict:
 
         previous_matches = get_last_matches_of_summoner_by_puuid(
             summoner_puuid=participant_puuid,
-            number_of_matches=20,
+            number_of_matches=NUMBER_OF_PREVIOUS_MATCHES,
             max_match_id=match_id,
         )
         for previous_match in previous_matches:
@@ -548,27 +724,36 @@ def extract_infos_from_match(match_with_tier: dict) -> dict:
 
         infos[team_id].append(participant_infos)
 
+    cache_tools.release_match_ids(seed_match_id=match_id)
     return infos
 
 
 @exception(logger)
-def extract_infos_from_matches(matches_with_tier: List[dict]) -> List[dict]:
-    """Returns informations from a list of matches with tier
+def iter_infos_from_matches(
+    matches_with_tier: Iterable[dict],
+    number_of_matches: int,
+    stop_condition: Union[None, Callable[[dict], bool]] = None,
+) -> Iterator[dict]:
+    """Iterates over the informations from matches with tier
 
     Args:
-        matches_with_tier (List[dict]): list of matches with tier
+        matches_with_tier (Iterable[dict]): matches with tier
+        number_of_matches (int): number of matches expected (for the progression)
+        stop_condition (Union[None, Callable[[dict], bool]], optional): called with the
+            informations of each match, the extraction stops when it returns True. Defaults to None.
 
-    Returns:
-        List[dict]: list of informations from the matches
+    Yields:
+        Iterator[dict]: informations from a match
     """
-
-    number_of_matches_with_tier = len(matches_with_tier)
-    infos_from_matches = []
     for i, match_with_tier in enumerate(matches_with_tier):
-        infos_from_matches.append(
-            extract_infos_from_match(match_with_tier=match_with_tier)
-        )
+        infos = extract_infos_from_match(match_with_tier=match_with_tier)
         logger.info(
-            f"Batch progression : {i+1}/{number_of_matches_with_tier} ({(i+1)/number_of_matches_with_tier:.2%})"
+            f"Batch progression : {i+1}/{number_of_matches} ({(i+1)/number_of_matches:.2%})"
         )
-    return infos_from_matches
+        stop = stop_condition is not None and stop_condition(infos)
+        yield infos
+        if stop:
+            logger.info(
+                f"Batch stopped early : {i+1}/{number_of_matches} matches extracted"
+            )
+            return
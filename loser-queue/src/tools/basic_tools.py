@@ -1,7 +1,10 @@
 from src import logger
 from src.tools.error_tools import exception
 
+import queue
+import threading
 from datetime import datetime, timezone
+from typing import Any, Iterable, Iterator
 
 
 @exception(logger)
@@ -15,3 +18,71 @@ def get_timestamp_utc() -> int:
     utc_time = dt.replace(tzinfo=timezone.utc)
     utc_timestamp = int(utc_time.timestamp())
     return utc_timestamp
+
+
+@exception(logger)
+def format_duration(seconds: float) -> str:
+    """Formats a duration in seconds as days, hours and minutes
+
+    Args:
+        seconds (float): the duration in seconds
+
+    Returns:
+        str: the formatted duration (ex: '1d 02h 03m')
+    """
+    minutes = int(seconds // 60)
+    days, minutes = divmod(minutes, 24 * 60)
+    hours, minutes = divmod(minutes, 60)
+    if days:
+        return f"{days}d {hours:02d}h {minutes:02d}m"
+    return f"{hours:02d}h {minutes:02d}m"
+
+
+@exception(logger)
+def iter_in_background(iterable: Iterable[Any], maxsize: int) -> Iterator[Any]:
+    """Iterates over an iterable consumed in a background thread through a bounded queue
+
+    The thread stays at most 'maxsize' items ahead of the consumer (it waits while the
+    queue is full) and stops when the returned iterator is closed.
+
+    Args:
+        iterable (Iterable[Any]): the iterable
+        maxsize (int): maximum number of items waiting in the queue
+
+    Yields:
+        Iterator[Any]: items of the iterable
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    end = object()
+
+    def put(item: Any, error: BaseException = None) -> bool:
+        while not stop.is_set():
+            try:
+                items.put((item, error), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(end, e)
+            return
+        put(end)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is end:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
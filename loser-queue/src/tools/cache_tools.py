@@ -0,0 +1,416 @@
+from src import logger
+from src import config
+from src.tools.error_tools import exception
+from src.tools import basic_tools, rate_tools
+
+import os
+import json
+import time
+import pathlib
+import threading
+from typing import List, Union
+
+
+CACHE_FOLDER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+    "data",
+    "cache",
+)
+MATCH_CACHE_FOLDER = os.path.join(CACHE_FOLDER, "matches")
+STATS_FILE_PATH = os.path.join(CACHE_FOLDER, "stats.json")
+ERRORS_FILE_PATH = os.path.join(CACHE_FOLDER, "errors.json")
+
+# Number of new errors written to the disk at once
+ERRORS_SAVE_INTERVAL = 100
+
+# Match IDs of each summoner's PUUID: {puuid: (timestamp, limit, match IDs)}
+_match_ids_cache = {}
+# Match IDs prefetched for a seed match, kept until it is extracted: {seed Match ID: {puuid}}
+_pinned_match_ids = {}
+# Number of seed matches pinning the Match IDs of each summoner's PUUID
+_pins = {}
+# HTTP errors (4xx) by endpoint and identifier: {"<endpoint>/<identifier>": [status code, timestamp]}
+_errors_cache = None
+# Number of errors cached since the last save
+_number_of_new_errors = 0
+# Hits and misses of the foreground requests and misses of the prefetcher by cache (this run only)
+_stats = {}
+_lock = threading.Lock()
+
+
+@exception(logger)
+def record_lookup(cache_name: str, hit: bool):
+    """Adds a lookup to the statistics of a cache
+
+    The misses of the prefetcher (requests sent with the quota of the extraction) are
+    counted apart ('prefetched'), its hits are ignored.
+
+    Args:
+        cache_name (str): name of the cache
+        hit (bool): True if the lookup was a hit
+    """
+    background = rate_tools.is_background()
+    if background and hit:
+        return
+
+    with _lock:
+        stats = _stats.setdefault(cache_name, {"hits": 0, "misses": 0, "prefetched": 0})
+        if background:
+            stats["prefetched"] += 1
+        else:
+            stats["hits" if hit else "misses"] += 1
+
+
+@exception(logger)
+def trim_match(match: dict) -> dict:
+    """Returns a match dict with only the fields used by the project
+
+    Args:
+        match (dict): match dict
+
+    Returns:
+        dict: trimmed match dict
+    """
+    return {
+        "metadata": {
+            "matchId": match["metadata"]["matchId"],
+            "participants": match["metadata"]["participants"],
+        },
+        "info": {
+            "participants": [
+                {
+                    "puuid": participant["puuid"],
+                    "teamId": participant["teamId"],
+                    "win": participant["win"],
+                }
+                for participant in match["info"]["participants"]
+            ]
+        },
+    }
+
+
+@exception(logger)
+def get_match_file_path(match_id: str) -> str:
+    """Returns the path of the cached match of a Match ID
+
+    Args:
+        match_id (str): Match ID
+
+    Returns:
+        str: path of the cached match
+    """
+    # Matches are split in 100 folders to keep folders small
+    return os.path.join(MATCH_CACHE_FOLDER, match_id[-2:], f"{match_id}.json")
+
+
+@exception(logger)
+def get_cached_match(match_id: str) -> Union[None, dict]:
+    """Returns the cached match of a Match ID
+
+    Args:
+        match_id (str): Match ID
+
+    Returns:
+        Union[None, dict]: None or the trimmed match dict
+    """
+    file_path = get_match_file_path(match_id=match_id)
+    if not os.path.exists(file_path):
+        record_lookup(cache_name="matches", hit=False)
+        return None
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        match = json.load(f)
+    record_lookup(cache_name="matches", hit=True)
+    return match
+
+
+@exception(logger)
+def cache_match(match: dict):
+    """Caches a trimmed match dict (a match never changes, it is cached forever)
+
+    Args:
+        match (dict): trimmed match dict
+    """
+    file_path = get_match_file_path(match_id=match["metadata"]["matchId"])
+    pathlib.Path(os.path.dirname(file_path)).mkdir(parents=True, exist_ok=True)
+    tmp_file_path = f"{file_path}.{threading.get_ident()}.tmp"
+    with open(tmp_file_path, "w", encoding="utf-8") as f:
+        json.dump(match, f, ensure_ascii=False)
+    os.replace(tmp_file_path, file_path)
+
+
+@exception(logger)
+def get_cached_match_ids(summoner_puuid: str, limit: int) -> Union[None, List[str]]:
+    """Returns the cached Match IDs of a summoner if they are not older than 'MATCH_IDS_CACHE_TTL'
+    or if they are pinned (see 'pin_match_ids')
+
+    Match IDs cached with a greater limit are used too (the newest Match IDs come first).
+
+    Args:
+        summoner_puuid (str): summoner's PUUID
+        limit (int): number of Match ID
+
+    Returns:
+        Union[None, List[str]]: None or a list of summoner's Match ID
+    """
+    settings = config.get_settings()
+    with _lock:
+        cached = _match_ids_cache.get(summoner_puuid)
+        pinned = summoner_puuid in _pins
+
+    if cached:
+        timestamp, cached_limit, match_ids = cached
+        if (
+            pinned or time.monotonic() - timestamp < settings.MATCH_IDS_CACHE_TTL
+        ) and cached_limit >= limit:
+            record_lookup(cache_name="match_ids", hit=True)
+            return match_ids[:limit]
+
+    record_lookup(cache_name="match_ids", hit=False)
+    return None
+
+
+@exception(logger)
+def cache_match_ids(summoner_puuid: str, limit: int, match_ids: List[str]):
+    """Caches the Match IDs of a summoner (in memory)
+
+    A valid entry with a greater limit is kept. The expired entries which are not
+    pinned are dropped (the entries are sorted from the oldest to the newest).
+
+    Args:
+        summoner_puuid (str): summoner's PUUID
+        limit (int): number of Match ID requested
+        match_ids (List[str]): a list of summoner's Match ID
+    """
+    settings = config.get_settings()
+    now = time.monotonic()
+    with _lock:
+        cached = _match_ids_cache.get(summoner_puuid)
+        if cached:
+            timestamp, cached_limit, _ = cached
+            if cached_limit > limit and (
+                summoner_puuid in _pins
+                or now - timestamp < settings.MATCH_IDS_CACHE_TTL
+            ):
+                return
+
+        expired_puuids = []
+        for cached_puuid, (timestamp, _, _) in _match_ids_cache.items():
+            if now - timestamp < settings.MATCH_IDS_CACHE_TTL:
+                break
+            if cached_puuid not in _pins:
+                expired_puuids.append(cached_puuid)
+        for cached_puuid in expired_puuids:
+            del _match_ids_cache[cached_puuid]
+
+        # Moved to the end to keep the entries sorted
+        _match_ids_cache.pop(summoner_puuid, None)
+        _match_ids_cache[summoner_puuid] = (now, limit, match_ids)
+
+
+@exception(logger)
+def pin_match_ids(summoner_puuid: str, seed_match_id: str):
+    """Keeps the cached Match IDs of a summoner, whatever their age, until a seed match
+    is extracted (see 'release_match_ids')
+
+    Args:
+        summoner_puuid (str): summoner's PUUID
+        seed_match_id (str): Match ID of the seed match
+    """
+    with _lock:
+        summoner_puuids = _pinned_match_ids.setdefault(seed_match_id, set())
+        if summoner_puuid not in summoner_puuids:
+            summoner_puuids.add(summoner_puuid)
+            _pins[summoner_puuid] = _pins.get(summoner_puuid, 0) + 1
+
+
+@exception(logger)
+def release_match_ids(seed_match_id: Union[None, str] = None):
+    """Releases the Match IDs pinned for a seed match (for every seed match if None)
+
+    Args:
+        seed_match_id (Union[None, str], optional): Match ID of the seed match. Defaults to None.
+    """
+    with _lock:
+        if seed_match_id is None:
+            _pinned_match_ids.clear()
+            _pins.clear()
+            return
+
+        for summoner_puuid in _pinned_match_ids.pop(seed_match_id, ()):
+            _pins[summoner_puuid] -= 1
+            if _pins[summoner_puuid] == 0:
+                del _pins[summoner_puuid]
+
+
+@exception(logger)
+def is_error_expired(status_code: int, timestamp: int) -> bool:
+    """Returns True if a cached HTTP error is older than the TTL of its status code
+    ('NEGATIVE_CACHE_TTLS')
+
+    Args:
+        status_code (int): HTTP status code
+        timestamp (int): timestamp of the error
+
+    Returns:
+        bool: True if the error is expired
+    """
+    ttl = config.get_settings().NEGATIVE_CACHE_TTLS.get(status_code)
+    return ttl is None or basic_tools.get_timestamp_utc() - timestamp >= ttl
+
+
+@exception(logger)
+def load_errors() -> dict:
+    """Returns the cached HTTP errors (loaded from the disk on first use, without the
+    expired errors)
+
+    Returns:
+        dict: HTTP errors by endpoint and identifier
+    """
+    global _errors_cache
+    with _lock:
+        if _errors_cache is None:
+            _errors_cache = {}
+            if os.path.exists(ERRORS_FILE_PATH):
+                with open(ERRORS_FILE_PATH, "r", encoding="utf-8") as f:
+                    _errors_cache = {
+                        key: [status_code, timestamp]
+                        for key, (status_code, timestamp) in json.load(f).items()
+                        if not is_error_expired(
+                            status_code=status_code, timestamp=timestamp
+                        )
+                    }
+        return _errors_cache
+
+
+@exception(logger)
+def get_cached_error(endpoint: str, identifier: str) -> Union[None, int]:
+    """Returns the cached HTTP error of a request if it is not older than the TTL of its
+    status code ('NEGATIVE_CACHE_TTLS')
+
+    Args:
+        endpoint (str): name of the endpoint
+        identifier (str): identifier requested (summoner's name, Match ID, ...)
+
+    Returns:
+        Union[None, int]: None or the HTTP status code
+    """
+    cached = load_errors().get(f"{endpoint}/{identifier}")
+    if cached:
+        status_code, timestamp = cached
+        if not is_error_expired(status_code=status_code, timestamp=timestamp):
+            record_lookup(cache_name="errors", hit=True)
+            return status_code
+
+    record_lookup(cache_name="errors", hit=False)
+    return None
+
+
+@exception(logger)
+def cache_error(endpoint: str, identifier: str, status_code: int):
+    """Caches the HTTP error of a request if its status code has a TTL ('NEGATIVE_CACHE_TTLS')
+
+    Errors are written to the disk by 'save_errors', every 'ERRORS_SAVE_INTERVAL' new errors.
+
+    Args:
+        endpoint (str): name of the endpoint
+        identifier (str): identifier requested (summoner's name, Match ID, ...)
+        status_code (int): HTTP status code
+    """
+    global _number_of_new_errors
+    settings = config.get_settings()
+    if status_code not in settings.NEGATIVE_CACHE_TTLS:
+        return
+
+    errors = load_errors()
+    with _lock:
+        errors[f"{endpoint}/{identifier}"] = [
+            status_code,
+            basic_tools.get_timestamp_utc(),
+        ]
+        _number_of_new_errors += 1
+        save = _number_of_new_errors >= ERRORS_SAVE_INTERVAL
+
+    if save:
+        save_errors()
+
+
+@exception(logger)
+def save_errors():
+    """Writes the cached HTTP errors to the disk (atomically, without the expired errors)
+    if errors were cached since the last save"""
+    global _number_of_new_errors
+    if not _number_of_new_errors:
+        return
+
+    errors = load_errors()
+    with _lock:
+        for key in [
+            key
+            for key, (status_code, timestamp) in errors.items()
+            if is_error_expired(status_code=status_code, timestamp=timestamp)
+        ]:
+            del errors[key]
+
+        pathlib.Path(CACHE_FOLDER).mkdir(parents=True, exist_ok=True)
+        tmp_file_path = f"{ERRORS_FILE_PATH}.tmp"
+        with open(tmp_file_path, "w", encoding="utf-8") as f:
+            json.dump(errors, f, ensure_ascii=False)
+        os.replace(tmp_file_path, ERRORS_FILE_PATH)
+        _number_of_new_errors = 0
+
+
+@exception(logger)
+def load_stats() -> dict:
+    """Returns the hits and misses of every previous run by cache
+
+    Returns:
+        dict: hits and misses by cache
+    """
+    if not os.path.exists(STATS_FILE_PATH):
+        return {}
+
+    with open(STATS_FILE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@exception(logger)
+def save_stats():
+    """Logs the hits and misses of this run, adds them to the saved statistics and
+    saves the cached HTTP errors"""
+    save_errors()
+    stats = load_stats()
+    with _lock:
+        for cache_name, run_stats in _stats.items():
+            logger.info(
+                f"Cache '{cache_name}': {run_stats['hits']} hits, {run_stats['misses']} misses, "
+                f"{run_stats['prefetched']} prefetched"
+            )
+            saved_stats = stats.setdefault(cache_name, {})
+            for key in ["hits", "misses", "prefetched"]:
+                saved_stats[key] = saved_stats.get(key, 0) + run_stats[key]
+        _stats.clear()
+
+    pathlib.Path(CACHE_FOLDER).mkdir(parents=True, exist_ok=True)
+    with open(STATS_FILE_PATH, "w", encoding="utf-8") as f:
+        json.dump(stats, f)
+
+
+@exception(logger)
+def get_hit_rates() -> dict:
+    """Returns the hit rate of every previous run by cache
+
+    The hits on entries fetched by the prefetcher did not save any request (the
+    prefetcher sent them with the same quota), so the misses of the prefetcher are
+    subtracted from the hits.
+
+    Returns:
+        dict: hit rate by cache
+    """
+    hit_rates = {}
+    for cache_name, stats in load_stats().items():
+        lookups = stats["hits"] + stats["misses"]
+        if lookups:
+            hits = max(stats["hits"] - stats.get("prefetched", 0), 0)
+            hit_rates[cache_name] = hits / lookups
+    return hit_rates
@@ -1,8 +1,11 @@
+import inspect
 import logging
 import time
 from sys import stdout
 from functools import wraps
 
+from src.tools.profile_tools import PROFILER, profile_call, profile_generator
+
 
 class NotWaitableHttpError(Exception):
     def __init__(self, *args: object) -> None:
@@ -34,9 +37,31 @@ def get_logger(logger_name: str) -> logging.Logger:
 
 def exception(logger):
     def decorator(func):
+        if inspect.isgeneratorfunction(func):
+
+            @wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                try:
+                    if PROFILER["enabled"]:
+                        yield from profile_generator(func, *args, **kwargs)
+                    else:
+                        yield from func(*args, **kwargs)
+                except GeneratorExit:
+                    # Closed by the consumer
+                    raise
+                except:
+                    issue = "exception in " + func.__name__ + "\n"
+                    issue = issue + "=============\n"
+                    logger.exception(issue)
+                    raise
+
+            return generator_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             try:
+                if PROFILER["enabled"]:
+                    return profile_call(func, *args, **kwargs)
                 return func(*args, **kwargs)
             except:
                 issue = "exception in " + func.__name__ + "\n"
@@ -0,0 +1,124 @@
+from src import logger
+from src import config
+from src.tools.error_tools import exception
+from src.tools import cache_tools, rate_tools
+
+import threading
+from collections import deque
+from typing import Any, Callable
+
+
+# Participants to prefetch: (seed Match ID, participant's PUUID), in extraction order
+_queue = deque()
+# Seed matches queued and not reached by the extraction yet
+_pending_seeds = set()
+_condition = threading.Condition()
+_stop = threading.Event()
+_thread = None
+
+
+@exception(logger)
+def prefetch_loop(prefetch_function: Callable[[str, str, Callable[[], bool]], Any]):
+    """Prefetches the queued participants with a low priority until the prefetcher is stopped
+
+    Args:
+        prefetch_function (Callable[[str, str, Callable[[], bool]], Any]): called with a
+            participant's PUUID, the seed Match ID and a function returning True once the
+            seed match is reached by the extraction (or the prefetcher stopped), fills the caches
+    """
+    rate_tools.set_background()
+    while True:
+        with _condition:
+            while not _queue and not _stop.is_set():
+                _condition.wait()
+            if _stop.is_set():
+                return
+            seed_match_id, summoner_puuid = _queue.popleft()
+            if seed_match_id not in _pending_seeds:
+                continue
+
+        try:
+            prefetch_function(
+                summoner_puuid,
+                seed_match_id,
+                lambda: seed_match_id not in _pending_seeds or _stop.is_set(),
+            )
+        except Exception:
+            logger.warning(
+                f"[Prefetch] Previous matches of Summoner with puuid: {summoner_puuid} can not be prefetched"
+            )
+
+
+@exception(logger)
+def start_prefetcher(prefetch_function: Callable[[str, str, Callable[[], bool]], Any]):
+    """Starts the prefetcher in a background thread if 'PREFETCH' is enabled
+
+    Args:
+        prefetch_function (Callable[[str, str, Callable[[], bool]], Any]): see 'prefetch_loop'
+    """
+    global _thread
+    if not config.get_settings().PREFETCH or _thread is not None:
+        return
+
+    _stop.clear()
+    _thread = threading.Thread(
+        target=prefetch_loop, args=(prefetch_function,), daemon=True
+    )
+    _thread.start()
+    logger.info("[Prefetch] Prefetcher started")
+
+
+@exception(logger)
+def stop_prefetcher():
+    """Stops the prefetcher (the request being prefetched is abandoned) and releases the
+    Match IDs it pinned"""
+    global _thread
+    if _thread is None:
+        return
+
+    with _condition:
+        _stop.set()
+        _queue.clear()
+        _pending_seeds.clear()
+        _condition.notify_all()
+    _thread = None
+    cache_tools.release_match_ids()
+    logger.info("[Prefetch] Prefetcher stopped")
+
+
+@exception(logger)
+def prefetch_participants_of_match(match: dict):
+    """Queues the participants of a seed match to prefetch their previous matches
+
+    Args:
+        match (dict): match dict
+    """
+    if _thread is None:
+        return
+
+    seed_match_id = match["metadata"]["matchId"]
+    with _condition:
+        if seed_match_id in _pending_seeds:
+            return
+
+        _pending_seeds.add(seed_match_id)
+        for summoner_puuid in match["metadata"]["participants"]:
+            _queue.append((seed_match_id, summoner_puuid))
+        _condition.notify_all()
+
+
+@exception(logger)
+def mark_seed_started(match_id: str):
+    """Stops the prefetching of the participants of a seed match reached by the extraction
+
+    Args:
+        match_id (str): Match ID of the seed match
+    """
+    with _condition:
+        if match_id not in _pending_seeds:
+            return
+
+        _pending_seeds.discard(match_id)
+        queue = [item for item in _queue if item[0] != match_id]
+        _queue.clear()
+        _queue.extend(queue)
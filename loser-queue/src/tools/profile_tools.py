@@ -0,0 +1,226 @@
+import os
+import time
+import logging
+import pathlib
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+
+# Statistics collected while the profiling is enabled
+PROFILER = {
+    "enabled": False,
+    "functions": {},
+    "stacks": {},
+    "stages": {},
+}
+
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable_profiling():
+    """Enables the collection of statistics by the 'error_tools.exception' decorator"""
+    PROFILER["enabled"] = True
+
+
+def get_function_name(func) -> str:
+    """Returns the name of a function in the statistics ('<module>.<function>')
+
+    Args:
+        func (Callable): the function
+
+    Returns:
+        str: name of the function
+    """
+    return f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+
+@contextmanager
+def measure(name: str):
+    """Adds the durations of a block to the statistics of a function
+
+    Durations are measured with the wall clock and the CPU clock of the thread, the
+    difference being the time spent waiting (HTTP requests, sleeps of the retries, ...).
+
+    Args:
+        name (str): name of the function
+    """
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+
+    # [name, wall time of the children, CPU time of the children]
+    frame = [name, 0.0, 0.0]
+    stack.append(frame)
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        path = ";".join(f[0] for f in stack)
+        stack.pop()
+        if stack:
+            stack[-1][1] += wall
+            stack[-1][2] += cpu
+
+        self_wall = wall - frame[1]
+        self_cpu = cpu - frame[2]
+        with _lock:
+            stats = PROFILER["functions"].setdefault(
+                name, {"calls": 0, "cumulative": 0.0, "self": 0.0, "self_cpu": 0.0}
+            )
+            stats["calls"] += 1
+            stats["cumulative"] += wall
+            stats["self"] += self_wall
+            stats["self_cpu"] += self_cpu
+            PROFILER["stacks"][path] = PROFILER["stacks"].get(path, 0.0) + self_wall
+
+
+def profile_call(func, *args, **kwargs):
+    """Calls a function and adds its durations to the statistics
+
+    Args:
+        func (Callable): the function
+
+    Returns:
+        Any: the result of the function
+    """
+    with measure(get_function_name(func)):
+        return func(*args, **kwargs)
+
+
+def profile_generator(func, *args, **kwargs):
+    """Iterates over a generator function and adds the durations of each item to the
+    statistics (a call being the production of an item)
+
+    The time spent by the consumer between two items is not counted.
+
+    Args:
+        func (Callable): the generator function
+
+    Yields:
+        Any: the items of the generator
+    """
+    name = get_function_name(func)
+    generator = func(*args, **kwargs)
+    try:
+        while True:
+            with measure(name):
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        generator.close()
+
+
+def iter_timed(iterable: Iterable, name: str) -> Iterator:
+    """Iterates over an iterable and adds the time spent producing its items to the
+    wall time of a stage of the run (if the profiling is enabled)
+
+    Args:
+        iterable (Iterable): the iterable
+        name (str): name of the stage
+
+    Yields:
+        Iterator: the items of the iterable
+    """
+    iterator = iter(iterable)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                if PROFILER["enabled"]:
+                    with _lock:
+                        PROFILER["stages"][name] = (
+                            PROFILER["stages"].get(name, 0.0)
+                            + time.perf_counter()
+                            - start
+                        )
+            yield item
+    finally:
+        if hasattr(iterator, "close"):
+            iterator.close()
+
+
+@contextmanager
+def stage(name: str):
+    """Measures the wall time of a stage of the run (if the profiling is enabled)
+
+    Args:
+        name (str): name of the stage
+    """
+    if not PROFILER["enabled"]:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            PROFILER["stages"][name] = (
+                PROFILER["stages"].get(name, 0.0) + time.perf_counter() - start
+            )
+
+
+def get_report() -> str:
+    """Returns the statistics as a text report
+
+    Returns:
+        str: the report
+    """
+    lines = ["Stages", f"{'wall (s)':>12}  stage"]
+    for name, wall in PROFILER["stages"].items():
+        lines.append(f"{wall:>12.3f}  {name}")
+
+    lines.extend(
+        [
+            "",
+            "Functions",
+            f"{'calls':>10}{'cumul (s)':>12}{'self (s)':>12}{'cpu (s)':>12}{'wait (s)':>12}  function",
+        ]
+    )
+    functions = sorted(
+        PROFILER["functions"].items(), key=lambda item: item[1]["self"], reverse=True
+    )
+    for name, stats in functions:
+        lines.append(
+            f"{stats['calls']:>10}{stats['cumulative']:>12.3f}{stats['self']:>12.3f}"
+            f"{stats['self_cpu']:>12.3f}{max(stats['self'] - stats['self_cpu'], 0.0):>12.3f}  {name}"
+        )
+    return "\n".join(lines)
+
+
+def dump_profile(folder: str, timestamp: int, logger: logging.Logger):
+    """Writes the report ('profile_<TIMESTAMP>.txt') and the folded stacks for
+    flamegraph.pl / speedscope ('profile_<TIMESTAMP>.folded', self time in microseconds)
+
+    Args:
+        folder (str): the destination folder
+        timestamp (int): timestamp of the files
+        logger (logging.Logger): logger used to log the report
+    """
+    pathlib.Path(folder).mkdir(parents=True, exist_ok=True)
+    report = get_report()
+
+    report_file_path = os.path.join(folder, f"profile_{timestamp}.txt")
+    with open(report_file_path, "w", encoding="utf-8") as f:
+        f.write(report + "\n")
+
+    folded_file_path = os.path.join(folder, f"profile_{timestamp}.folded")
+    with open(folded_file_path, "w", encoding="utf-8") as f:
+        for path, self_wall in PROFILER["stacks"].items():
+            f.write(f"{path} {int(self_wall * 1e6)}\n")
+
+    logger.info(f"Profile:\n{report}")
+    logger.info(
+        f"Profile is located in files with path: '{report_file_path}' and '{folded_file_path}'"
+    )
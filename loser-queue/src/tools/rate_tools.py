@@ -0,0 +1,175 @@
+from src import logger
+from src import config
+from src.tools.error_tools import exception
+
+import math
+import time
+import threading
+from collections import deque
+
+
+# Sliding windows of the requests sent by routing value (euw1, europe, ...)
+_limiters = {}
+_condition = threading.Condition()
+_local = threading.local()
+
+
+@exception(logger)
+def set_background():
+    """Gives a low priority to the requests sent by the current thread
+
+    A low priority request is only sent with the rate budget left once the high
+    priority requests are reserved (see 'get_waiting_time').
+    """
+    _local.background = True
+
+
+@exception(logger)
+def is_background() -> bool:
+    """Returns True if the requests sent by the current thread have a low priority
+
+    Returns:
+        bool: True if the requests have a low priority
+    """
+    return getattr(_local, "background", False)
+
+
+@exception(logger)
+def get_limiter(region: str) -> dict:
+    """Returns the limiter of a routing value (created on first use)
+
+    Args:
+        region (str): routing value (euw1, europe, ...)
+
+    Returns:
+        dict: the limiter
+    """
+    if region not in _limiters:
+        settings = config.get_settings()
+        _limiters[region] = {
+            "first_foreground_at": None,
+            "foreground_waiting": 0,
+            # [number of requests, seconds, foreground timestamps, background timestamps,
+            # most foreground requests seen in a window]
+            "windows": [
+                [number_of_requests, seconds, deque(), deque(), 0]
+                for number_of_requests, seconds in settings.RATE_LIMITS
+            ],
+        }
+    return _limiters[region]
+
+
+@exception(logger)
+def get_waiting_time(limiter: dict, background: bool) -> float:
+    """Returns the time to wait before a request can be sent (0 if it can be sent now)
+
+    In each window, the high priority requests are given a reservation: the most high
+    priority requests seen in a window so far, and at least 'PREFETCH_RESERVE' of the
+    window. A low priority request is only sent if it fits in the window with the
+    reservation, so it never delays a high priority request unless the high priority
+    requests exceed their reservation. Low priority requests are blocked until a whole
+    window of high priority requests has been seen.
+
+    Args:
+        limiter (dict): the limiter of a routing value
+        background (bool): True if the request has a low priority
+
+    Returns:
+        float: the time to wait in seconds
+    """
+    settings = config.get_settings()
+    now = time.monotonic()
+    waiting_time = 0.0
+    for (
+        number_of_requests,
+        seconds,
+        foreground_timestamps,
+        background_timestamps,
+        peak_foreground,
+    ) in limiter["windows"]:
+        for timestamps in (foreground_timestamps, background_timestamps):
+            while timestamps and timestamps[0] <= now - seconds:
+                timestamps.popleft()
+
+        number_of_background = len(background_timestamps)
+        number_of_requests_left = number_of_requests
+        if background:
+            if limiter["first_foreground_at"] is None:
+                waiting_time = max(waiting_time, seconds)
+                continue
+            if now - limiter["first_foreground_at"] < seconds:
+                waiting_time = max(
+                    waiting_time, limiter["first_foreground_at"] + seconds - now
+                )
+                continue
+
+            reservation = max(
+                peak_foreground,
+                math.ceil(number_of_requests * settings.PREFETCH_RESERVE),
+            )
+            number_of_requests_left -= reservation
+            # Low priority requests only share the budget left by the reservation
+            if number_of_background >= number_of_requests_left:
+                if background_timestamps:
+                    waiting_time = max(
+                        waiting_time, background_timestamps[0] + seconds - now
+                    )
+                else:
+                    waiting_time = max(waiting_time, seconds)
+                continue
+
+            number_of_requests_left -= number_of_background
+            number_of_background = 0
+
+        if len(foreground_timestamps) + number_of_background >= number_of_requests_left:
+            oldest = min(
+                timestamps[0]
+                for timestamps in (foreground_timestamps, background_timestamps)
+                if timestamps
+            )
+            waiting_time = max(waiting_time, oldest + seconds - now)
+
+    if background and limiter["foreground_waiting"]:
+        waiting_time = max(waiting_time, 0.1)
+    return waiting_time
+
+
+@exception(logger)
+def acquire(region: str):
+    """Waits until a request can be sent to a routing value without exceeding the
+    rate limits of the key ('RATE_LIMITS') and records it
+
+    The limits are only enforced when the prefetcher is enabled ('PREFETCH'), to share
+    them between the extraction and the prefetcher. Otherwise the requests are sent
+    at once and the HTTP 429 responses are retried.
+
+    Args:
+        region (str): routing value (euw1, europe, ...)
+    """
+    if not config.get_settings().PREFETCH:
+        return
+
+    background = is_background()
+    with _condition:
+        limiter = get_limiter(region=region)
+        if not background:
+            limiter["foreground_waiting"] += 1
+        try:
+            waiting_time = get_waiting_time(limiter=limiter, background=background)
+            while waiting_time > 0:
+                _condition.wait(timeout=waiting_time)
+                waiting_time = get_waiting_time(limiter=limiter, background=background)
+        finally:
+            if not background:
+                limiter["foreground_waiting"] -= 1
+
+        now = time.monotonic()
+        if not background and limiter["first_foreground_at"] is None:
+            limiter["first_foreground_at"] = now
+        for window in limiter["windows"]:
+            if background:
+                window[3].append(now)
+            else:
+                window[2].append(now)
+                window[4] = max(window[4], len(window[2]))
+        _condition.notify_all()
@@ -0,0 +1,135 @@
+from src import logger
+from src.tools.error_tools import exception
+
+import math
+from statistics import NormalDist
+
+
+# Running sums of the products of the counts of each match needed by the variance:
+# a = victories after a victory, n = results after a victory,
+# b = victories after a defeat, m = results after a defeat
+PRODUCTS = ["aa", "an", "nn", "bb", "bm", "mm", "ab", "am", "nb", "nm"]
+
+
+@exception(logger)
+def get_empty_streak_counts() -> dict:
+    """Returns empty counters of results following a victory or a defeat
+
+    Returns:
+        dict: counters of results following a victory or a defeat, number of matches
+        and running sums of the products of the counters of each match ('products')
+    """
+    return {
+        "after_victory": {"victory": 0, "defeat": 0},
+        "after_defeat": {"victory": 0, "defeat": 0},
+        "number_of_matches": 0,
+        "products": {product: 0 for product in PRODUCTS},
+    }
+
+
+@exception(logger)
+def update_streak_counts(streak_counts: dict, infos: dict) -> dict:
+    """Updates the counters with the previous matches of every participant of a match
+
+    Args:
+        streak_counts (dict): counters of results following a victory or a defeat
+        infos (dict): informations from a match (see 'api_tools.extract_infos_from_match')
+
+    Returns:
+        dict: the updated counters
+    """
+    match_counts = {
+        "after_victory": {"victory": 0, "defeat": 0},
+        "after_defeat": {"victory": 0, "defeat": 0},
+    }
+    for team_id in ["team_100", "team_200"]:
+        for participant_infos in infos[team_id]:
+            # Previous matches are sorted from the newest to the oldest
+            results = [
+                previous_match["result"]
+                for previous_match in participant_infos["previous_matches"]
+            ]
+            for i in range(len(results) - 1):
+                result, previous_result = results[i], results[i + 1]
+                if result is None or previous_result is None:
+                    continue
+                match_counts[f"after_{previous_result}"][result] += 1
+
+    for previous_result in ["after_victory", "after_defeat"]:
+        for result in ["victory", "defeat"]:
+            streak_counts[previous_result][result] += match_counts[previous_result][
+                result
+            ]
+
+    after_victory = match_counts["after_victory"]
+    after_defeat = match_counts["after_defeat"]
+    counts = {
+        "a": after_victory["victory"],
+        "n": after_victory["victory"] + after_victory["defeat"],
+        "b": after_defeat["victory"],
+        "m": after_defeat["victory"] + after_defeat["defeat"],
+    }
+    streak_counts["number_of_matches"] += 1
+    for product in PRODUCTS:
+        streak_counts["products"][product] += counts[product[0]] * counts[product[1]]
+    return streak_counts
+
+
+@exception(logger)
+def get_streak_effect(streak_counts: dict, confidence: float = 0.95) -> dict:
+    """Returns the streak effect (win rate after a victory - win rate after a defeat)
+    and the width of its confidence interval
+
+    The pairs of consecutive results of a participant (and of the participants of a
+    same match, who share previous matches) are not independent, so the match is the
+    sampling unit: the variance is the cluster-robust (by match) variance of the
+    difference of the two ratio estimators, which is much wider than the binomial
+    variance computed as if every pair was independent. It is computed from running
+    sums, in constant time.
+
+    Args:
+        streak_counts (dict): counters of results following a victory or a defeat
+        confidence (float, optional): confidence level of the interval. Defaults to 0.95.
+
+    Returns:
+        dict: 'effect', 'ci_width' and 'number_of_pairs' ('effect' and 'ci_width' are None
+        while one of the counters is empty or with less than 2 matches)
+    """
+    after_victory = streak_counts["after_victory"]
+    after_defeat = streak_counts["after_defeat"]
+    n_victory = after_victory["victory"] + after_victory["defeat"]
+    n_defeat = after_defeat["victory"] + after_defeat["defeat"]
+
+    streak_effect = {
+        "effect": None,
+        "ci_width": None,
+        "number_of_pairs": n_victory + n_defeat,
+    }
+    number_of_matches = streak_counts["number_of_matches"]
+    if n_victory == 0 or n_defeat == 0 or number_of_matches < 2:
+        return streak_effect
+
+    p_victory = after_victory["victory"] / n_victory
+    p_defeat = after_defeat["victory"] / n_defeat
+
+    # Sums over the matches of the squared and crossed residuals of the ratio
+    # estimators: u = a - p_victory * n and w = b - p_defeat * m
+    sums = streak_counts["products"]
+    sum_uu = sums["aa"] - 2 * p_victory * sums["an"] + p_victory**2 * sums["nn"]
+    sum_ww = sums["bb"] - 2 * p_defeat * sums["bm"] + p_defeat**2 * sums["mm"]
+    sum_uw = (
+        sums["ab"]
+        - p_defeat * sums["am"]
+        - p_victory * sums["nb"]
+        + p_victory * p_defeat * sums["nm"]
+    )
+    variance = (
+        sum_uu / n_victory**2
+        + sum_ww / n_defeat**2
+        - 2 * sum_uw / (n_victory * n_defeat)
+    ) * (number_of_matches / (number_of_matches - 1))
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    streak_effect["effect"] = p_victory - p_defeat
+    streak_effect["ci_width"] = 2 * z * math.sqrt(max(variance, 0.0))
+    return streak_effect